@@ -5,6 +5,11 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
 WARN = 300
 ERROR = 500
+# 复用仓库主脚本的非空行计数（按字节批量统计，不逐行切分）
+sys.path.insert(0, str(ROOT.parent / 'scripts'))
+
+from check_file_size import count_nonblank_lines  # noqa: E402
+
 EXTS = {'.ts', '.py', '.sh'}
 EXCLUDES = {'node_modules', 'dist', '.git', '.vscode'}
 
@@ -17,8 +22,7 @@ for path in ROOT.rglob('*'):
         continue
     if any(part in EXCLUDES for part in path.parts):
         continue
-    lines = [line for line in path.read_text(encoding='utf-8', errors='ignore').splitlines() if line.strip()]
-    count = len(lines)
+    count = count_nonblank_lines(path.read_bytes())
     files.append((path.relative_to(ROOT), count))
     if count > ERROR:
         errors.append((path.relative_to(ROOT), count))
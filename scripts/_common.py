@@ -0,0 +1,167 @@
+"""
+检查脚本共用的源文件遍历、读取与结果缓存
+
+check_file_size.py / check_todos.py 以及一次遍历驱动检查的 checks.py 共用此模块。
+"""
+
+import contextlib
+import functools
+import json
+import mmap
+import os
+import stat
+import subprocess
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
+
+# (文件路径, 以 / 分隔的相对路径, 签名 [st_mtime_ns, st_size] 或 None)
+SourceFile = Tuple[str, str, Optional[List[int]]]
+# 文件内容缓冲区：小文件为 bytes，大文件为只读 mmap
+Buffer = Union[bytes, mmap.mmap]
+
+MMAP_MIN_SIZE = 1 << 20  # 达到该大小的文件改用 mmap 映射，避免整份复制到堆上
+
+def _scan(root: str, rel_root: str, ext_tuple: Tuple[str, ...], exclude: FrozenSet[str]):
+    """递归扫描目录，逐个产出匹配扩展名的 (DirEntry, 相对路径)；无法读取的目录直接跳过"""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                # 与 os.walk 一致，无法判断类型的条目按文件处理
+                is_dir = False
+            if is_dir:
+                # 过滤排除目录
+                if entry.name in exclude:
+                    continue
+                yield from _scan(entry.path, rel_root + entry.name + "/", ext_tuple, exclude)
+            elif entry.name.endswith(ext_tuple):
+                yield entry, rel_root + entry.name
+
+def entry_signature(entry: os.DirEntry) -> Optional[List[int]]:
+    """文件签名 [st_mtime_ns, st_size]，取自扫描目录时的 DirEntry，无法 stat 时返回 None"""
+    try:
+        st = entry.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _git_ls_files(root: str, extensions: FrozenSet[str]) -> Optional[List[str]]:
+    """root 位于 git 仓库内时，用 git ls-files 列出已跟踪及未被忽略的文件（相对 root）；否则返回 None"""
+    try:
+        proc = subprocess.run(
+            ['git', '-C', root, 'ls-files', '-z', '--cached', '--others', '--exclude-standard', '--']
+            + ['*' + ext for ext in sorted(extensions)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    # 冲突文件会按暂存阶段重复列出，去重并保持顺序
+    return list(dict.fromkeys(os.fsdecode(path) for path in proc.stdout.split(b'\0') if path))
+
+def _git_source_files(root: str, rel_paths: List[str], exclude: FrozenSet[str]) -> Iterator[SourceFile]:
+    """按 git 列出的相对路径过滤排除目录并取签名；已跟踪但工作区已删除的文件直接跳过"""
+    for rel_path in rel_paths:
+        if not exclude.isdisjoint(rel_path.split("/")[:-1]):
+            continue
+        file_path = os.path.join(root, rel_path)
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            yield file_path, rel_path, None
+            continue
+        if stat.S_ISREG(st.st_mode):
+            yield file_path, rel_path, [st.st_mtime_ns, st.st_size]
+
+@functools.lru_cache(maxsize=None)
+def walk_source_files(root: str, extensions: FrozenSet[str], exclude: FrozenSet[str]) -> Tuple[SourceFile, ...]:
+    """遍历 root 下的源文件；同一进程内相同参数只遍历一次
+
+    git 仓库内优先用 git ls-files，被 .gitignore 忽略的目录完全不进入；
+    git 不可用或 root 不在仓库中时回退到 os.scandir 递归遍历。
+    """
+    rel_paths = _git_ls_files(root, extensions)
+    if rel_paths is not None:
+        return tuple(_git_source_files(root, rel_paths, exclude))
+    return tuple(
+        (entry.path, rel_path, entry_signature(entry))
+        for entry, rel_path in _scan(root, "", tuple(extensions), exclude)
+    )
+
+def select_files(files: Iterable[SourceFile], extensions: Iterable[str], exclude: Iterable[str]) -> List[SourceFile]:
+    """从一次遍历的结果中挑出某项检查关心的文件（扩展名匹配且不在其排除目录下）"""
+    ext_tuple = tuple(extensions)
+    exclude = set(exclude)
+    return [
+        source for source in files
+        if source[1].endswith(ext_tuple) and exclude.isdisjoint(source[1].split("/")[:-1])
+    ]
+
+def read_bytes(file_path: str, size: Optional[int] = None) -> bytes:
+    """读取文件原始字节；已知大小时用 os.read 一次读完，不做解码"""
+    if size is None:
+        with open(file_path, 'rb') as f:
+            return f.read()
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+@contextlib.contextmanager
+def open_buffer(file_path: str, size: Optional[int] = None) -> Iterator[Buffer]:
+    """以只读缓冲区打开文件：大文件用 mmap 映射（支持 find/rfind/切片/正则，但没有 count），其余读入 bytes"""
+    if size is not None and size < MMAP_MIN_SIZE:
+        yield read_bytes(file_path, size)
+        return
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+def count_newlines(buf: Buffer, start: int, end: int) -> int:
+    """统计 buf[start:end] 中的换行数；mmap 没有 count 方法，只复制该区段"""
+    if isinstance(buf, bytes):
+        return buf.count(b'\n', start, end)
+    return buf[start:end].count(b'\n')
+
+def scope_cache_path(root_dir: Path, cache_file: Path, scope: str) -> Path:
+    """按 scope 分文件的缓存路径（如 check_todos.json → check_todos-rust.json）
+
+    每次运行只写入本 scope 当前存在的文件，已删除或改名的文件随之从缓存中清除。
+    """
+    return root_dir / cache_file.with_name(f"{cache_file.stem}-{scope}{cache_file.suffix}")
+
+def load_cache(cache_path: Path, header: Dict) -> Dict[str, List]:
+    """读取结果缓存，返回 {相对路径: [st_mtime_ns, st_size, ...]}；缓存头不一致时整体失效"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("header") != header:
+        return {}
+    return data.get("entries", {})
+
+def save_cache(cache_path: Path, header: Dict, entries: Dict[str, List]):
+    """写入结果缓存（先写临时文件再替换）；写入失败时静默跳过"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"header": header, "entries": entries}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
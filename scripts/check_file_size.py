@@ -6,80 +6,169 @@
 此脚本扫描项目中的 Rust 文件，标记出超过指定行数的文件。
 """
 
-import os
+import re
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from _common import (
+    Buffer, SourceFile, count_newlines, load_cache, open_buffer, read_bytes, save_cache, scope_cache_path,
+    select_files, walk_source_files,
+)
 
 # 配置
 MAX_LINES_WARNING = 300   # 警告阈值
 MAX_LINES_ERROR = 500     # 错误阈值
 EXCLUDE_DIRS = {'.git', 'target', 'node_modules', '.gemini'}
 EXTENSIONS = {'.rs', '.py', '.lcy'}
+PARALLEL_MIN_FILES = 2000  # 文件数达到该值时才启用多进程（进程启动开销高于小仓库的全部扫描耗时）
+CACHE_FILE = Path('target') / 'lency-checks' / 'check_file_size.json'  # 相对项目根目录，按 scope 分文件
+CACHE_SCHEMA_VERSION = 2  # 行数统计规则变化时递增，使旧缓存失效
 
-def in_scope(rel_path: Path, scope: str) -> bool:
-    path = rel_path.as_posix()
+def in_scope(rel_path: str, scope: str) -> bool:
     if scope == "all":
         return True
     if scope == "rust":
         return (
-            path.startswith("crates/")
-            or path.startswith("lib/")
-            or path.startswith("tests/integration/")
+            rel_path.startswith("crates/")
+            or rel_path.startswith("lib/")
+            or rel_path.startswith("tests/integration/")
         )
     if scope == "lency":
         return (
-            path.startswith("lencyc/")
-            or path.startswith("lib/")
-            or path.startswith("tests/example/")
+            rel_path.startswith("lencyc/")
+            or rel_path.startswith("lib/")
+            or rel_path.startswith("tests/example/")
         )
     return False
 
-def count_rust_code_lines(content: str) -> int:
-    """计算 Rust/Lency 代码行数，排除注释（包括嵌套块注释）和空行"""
-    # 替换块注释内容为空格，但保留换行符以维持行号/结构
-    processed = []
-    i = 0
+# Rust/Lency 代码区中会改变扫描状态的记号，合并为一个正则由引擎一次定位：
+# 行注释、块注释起点（紧跟 * 的 / 属于孤立的 */，不算注释起点）、字符串、字符字面量。
+# 字符串的转义可跨行（行尾 \ 续行）；未闭合的字符串不命中结束引号分组。
+# 除号、生命周期和未闭合的单引号不匹配任何分支，留在普通代码中一并统计
+RUST_CODE_TOKEN = re.compile(rb'/(?<!\*/)(?:(/)|(\*))|"(?:[^"\\]+|\\[\s\S])*(")?' rb"|'(?:\\.|[^'\\\n])'")
+# RUST_CODE_TOKEN 命中的分组 (lastindex) 即状态转移，无分组时为字符字面量或未闭合的字符串
+TOKEN_LINE_COMMENT = 1
+TOKEN_BLOCK_COMMENT = 2
+TOKEN_STRING = 3
+# 标识符字节，用于判断 r"…" 的 r 是否为独立前缀；非 ASCII 字节按标识符处理
+IDENT_BYTES = frozenset(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz' + bytes(range(0x80, 0x100)))
+# 块注释内部只关心嵌套边界；命中分组 1 为嵌套的 /*，否则为 */
+RUST_COMMENT_TOKEN = re.compile(rb'/(\*)|\*/')
+# 两个换行之间只含空白的空行
+BLANK_LINE = re.compile(rb'\n[ \t\r\f\v]*(?=\n)')
+
+def count_inner_lines(content: Buffer, first: int, last: int) -> int:
+    """统计换行 first 与 last 之间整行中的非空行数，总数减去空行数，均由 C 层批量完成"""
+    middle = count_newlines(content, first, last)
+    if middle:
+        middle -= len(BLANK_LINE.findall(content, first, last + 1))
+    return middle
+
+def count_code_text(content: Buffer, start: int, end: int, has_code: bool) -> Tuple[int, bool]:
+    """统计不含注释/字面量的文本 content[start:end]，返回 (其中结束的代码行数, 末行是否已有代码)"""
+    first = content.find(b'\n', start, end)
+    if first < 0:
+        return 0, has_code or bool(content[start:end].strip())
+    last = content.rfind(b'\n', start, end)
+    lines = 1 if has_code or content[start:first].strip() else 0
+    lines += count_inner_lines(content, first, last)
+    return lines, bool(content[last + 1:end].strip())
+
+def count_nonblank_lines(content: Buffer) -> int:
+    """计算非空行数（不识别注释），换行与空行均由 C 层批量统计"""
+    lines, has_code = count_code_text(content, 0, len(content), False)
+    return lines + has_code
+
+def raw_string_end(content: Buffer, quote: int) -> Optional[int]:
+    """quote 处的 " 开启原始字符串 r"…" / r#"…"#（含 br、cr 前缀）时返回其结束位置（未闭合为 -1），否则返回 None"""
+    start = quote
+    while start > 0 and content[start - 1] == 0x23:  # '#'
+        start -= 1
+    hashes = quote - start
+    if start == 0 or content[start - 1] != 0x72:  # 'r'
+        return None
+    start -= 1
+    if start > 0 and content[start - 1] in b'bc':
+        start -= 1
+    if start > 0 and content[start - 1] in IDENT_BYTES:
+        return None
+    closing = b'"' + b'#' * hashes
+    close = content.find(closing, quote + 1)
+    return close + len(closing) if close >= 0 else -1
+
+def count_rust_code_lines(content: Buffer, limit: Optional[int] = None) -> int:
+    """计算 Rust/Lency 代码行数，排除注释（包括嵌套块注释）和空行
+
+    直接在文件原始字节（bytes 或大文件的 mmap）上扫描（无需 UTF-8 解码）。每次用
+    一个合并正则跳到下一个注释或字面量记号，其间的换行与空行用 bytes.count / 正则
+    批量统计；字符串（含原始字符串）内的 // 和 /* 不会被当作注释。
+    给定 limit 时，行数一旦超过 limit 即停止扫描并返回 limit + 1（只表示超限，
+    不是实际行数）。
+    """
+    code_lines = 0
     depth = 0
-    while i < len(content):
-        if content[i:i+2] == '/*':
-            depth += 1
-            processed.append('  ')
-            i += 2
-        elif content[i:i+2] == '*/':
-            if depth > 0:
-                depth -= 1
-                processed.append('  ')
-                i += 2
-            else:
-                # 孤立的 */，在 Rust 中可能是语法错误，这里直接保留
-                processed.append('*/')
-                i += 2
+    has_code = False
+    pos = 0
+    size = len(content)
+    while pos < size:
+        if limit is not None and code_lines > limit:
+            return limit + 1
+        if depth > 0:
+            token = RUST_COMMENT_TOKEN.search(content, pos)
+            end = token.start() if token else size
+            if content.find(b'\n', pos, end) >= 0:
+                if has_code:
+                    code_lines += 1
+                has_code = False
+            if token is None:
+                break
+            depth += 1 if token.lastindex else -1
+            pos = token.end()
+            continue
+
+        token = RUST_CODE_TOKEN.search(content, pos)
+        end = token.start() if token else size
+        lines, has_code = count_code_text(content, pos, end, has_code)
+        code_lines += lines
+        if token is None:
+            break
+        kind = token.lastindex
+        pos = token.end()
+        if kind == TOKEN_LINE_COMMENT:
+            newline = content.find(b'\n', pos)
+            pos = size if newline < 0 else newline
+        elif kind == TOKEN_BLOCK_COMMENT:
+            depth = 1
         else:
-            if depth > 0:
-                if content[i] == '\n':
-                    processed.append('\n')
-                else:
-                    processed.append(' ')
-            else:
-                processed.append(content[i])
-            i += 1
-    
-    clean_content = "".join(processed)
-    code_lines = 0
-    for line in clean_content.splitlines():
-        # 处理单行注释
-        # 这是一个近似实现，不考虑字符串内的 //
-        if '//' in line:
-            line = line.split('//')[0]
-        
-        if line.strip():
-            code_lines += 1
-    return code_lines
+            if kind == TOKEN_STRING or content[end] == 0x22:  # '"'
+                if end > 0 and content[end - 1] in b'r#':
+                    # 原始字符串内没有转义，按 "# 的个数找结束位置
+                    raw_end = raw_string_end(content, end)
+                    if raw_end is not None:
+                        kind = TOKEN_STRING if raw_end >= 0 else None
+                        pos = raw_end
+                if kind != TOKEN_STRING:
+                    # 未闭合的引号，按普通代码处理
+                    has_code = True
+                    pos = end + 1
+                    continue
+            # 字符串/字符字面量；跨行字符串的中间行按非空行计入
+            first = content.find(b'\n', end, pos)
+            if first >= 0:
+                last = content.rfind(b'\n', end, pos)
+                code_lines += 1 + count_inner_lines(content, first, last)
+            has_code = True
+    if has_code:
+        code_lines += 1
+    # 整段无记号的代码是批量统计的，结果同样封顶
+    return code_lines if limit is None else min(code_lines, limit + 1)
 
-def count_python_code_lines(content: str) -> int:
-    """计算 Python 代码行数，排除注释和空行"""
+def count_python_code_lines(content: bytes) -> int:
+    """计算 Python 代码行数，排除注释和空行（直接处理原始字节）"""
     code_lines = 0
     in_multiline = False
     quote_char = None
@@ -98,11 +187,11 @@ def count_python_code_lines(content: str) -> int:
             continue
             
         # 跳过单行注释
-        if stripped.startswith('#'):
+        if stripped.startswith(b'#'):
             continue
             
         # 检测多行字符串开始（docstring）
-        for quote in ('"""', "'''"):
+        for quote in (b'"""', b"'''"):
             if quote in stripped:
                 count = stripped.count(quote)
                 if count == 1:
@@ -116,76 +205,119 @@ def count_python_code_lines(content: str) -> int:
     
     return code_lines
 
-def count_lines(file_path: Path) -> int:
-    """根据文件类型计算有效行数"""
+def count_lines(file_path: str, size: Optional[int] = None, limit: Optional[int] = None) -> Optional[int]:
+    """根据文件类型计算有效行数，读取失败时返回 None；limit 用于 Rust/Lency 文件超限后提前停止计数"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            if file_path.suffix == '.rs' or file_path.suffix == '.lcy':
-                return count_rust_code_lines(content)
-            elif file_path.suffix == '.py':
-                return count_python_code_lines(content)
-            else:
-                return sum(1 for line in content.splitlines() if line.strip())
+        if file_path.endswith('.py'):
+            # 逐行处理需要 bytes.splitlines，始终读入内存
+            return count_python_code_lines(read_bytes(file_path, size))
+        with open_buffer(file_path, size) as content:
+            if file_path.endswith(('.rs', '.lcy')):
+                return count_rust_code_lines(content, limit)
+            return count_nonblank_lines(content)
     except Exception as e:
         print(f"⚠️  无法读取 {file_path}: {e}", file=sys.stderr)
-        return 0
-
-def find_code_files(root_dir: Path, scope: str = "all") -> List[Path]:
-    """查找所有代码文件 (Rust, Python)"""
-    code_files = []
-    for root, dirs, files in os.walk(root_dir):
-        # 过滤排除目录
-        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
-        
-        for file in files:
-            rel_root = Path(root).relative_to(root_dir)
-            rel_path = rel_root / file
-            if not in_scope(rel_path, scope):
-                continue
-            if any(file.endswith(ext) for ext in EXTENSIONS):
-                code_files.append(Path(root) / file)
-    
-    return code_files
-
-def check_file_sizes(root_dir: Path, scope: str = "all") -> Tuple[List, List]:
-    """检查文件大小，返回 (warnings, errors)"""
+        return None
+
+def find_code_files(root_dir: Path, scope: str = "all", files: Optional[Iterable[SourceFile]] = None) -> List[SourceFile]:
+    """查找所有代码文件 (Rust, Python)，返回 (文件路径, 相对路径, 签名)；files 为已有遍历结果时只做筛选"""
+    if files is None:
+        files = walk_source_files(str(root_dir), frozenset(EXTENSIONS), frozenset(EXCLUDE_DIRS))
+    else:
+        files = select_files(files, EXTENSIONS, EXCLUDE_DIRS)
+    return [source for source in files if in_scope(source[1], scope)]
+
+def cache_header() -> Dict:
+    """缓存头：计数规则版本或阈值变化时，旧缓存整体失效"""
+    return {
+        "schema": CACHE_SCHEMA_VERSION,
+        "thresholds": [MAX_LINES_WARNING, MAX_LINES_ERROR],
+    }
+
+def check_file_sizes(
+    root_dir: Path,
+    scope: str = "all",
+    use_cache: bool = True,
+    files: Optional[Iterable[SourceFile]] = None,
+    quick: bool = False,
+) -> Tuple[List, List, List, Set[str]]:
+    """检查文件大小，返回 (warnings, errors, results, truncated)，results 为全部 (文件, 行数)
+
+    quick 为 True 时，新统计的 Rust/Lency 文件超过错误阈值即停止计数；这些文件记入
+    truncated，其行数只是下限，不写入缓存。缓存命中与 Python 文件的行数始终是精确值。
+    """
     warnings = []
     errors = []
+    results = []
+    truncated = set()
+    
+    found = find_code_files(root_dir, scope, files)
+    code_files = [file_path for file_path, _, _ in found]
+    rel_paths = [rel_path for _, rel_path, _ in found]
+    signatures = [signature for _, _, signature in found]
+    
+    # 签名 (mtime, size) 未变的文件直接复用缓存行数，只重新统计其余文件
+    cache_path = scope_cache_path(root_dir, CACHE_FILE, scope)
+    cache = load_cache(cache_path, cache_header()) if use_cache else {}
+    entries = {}
+    line_counts = [0] * len(code_files)
+    pending = []
+    for i, rel_path in enumerate(rel_paths):
+        signature = signatures[i]
+        cached = cache.get(rel_path)
+        if signature is not None and cached and cached[:2] == signature:
+            line_counts[i] = cached[2]
+        elif signature is not None and signature[1] == 0:
+            # 空文件无需打开
+            line_counts[i] = 0
+        else:
+            pending.append(i)
     
-    code_files = find_code_files(root_dir, scope)
+    pending_files = [code_files[i] for i in pending]
+    pending_sizes = [signatures[i][1] if signatures[i] else None for i in pending]
+    limit = MAX_LINES_ERROR if quick else None
+    if len(pending_files) >= PARALLEL_MIN_FILES:
+        # 行数统计是 CPU 密集型，文件足够多时分发到多进程；map 保持文件顺序
+        with ProcessPoolExecutor() as executor:
+            counted = list(executor.map(count_lines, pending_files, pending_sizes, repeat(limit), chunksize=32))
+    else:
+        counted = [count_lines(file_path, size, limit) for file_path, size in zip(pending_files, pending_sizes)]
+    for i, lines in zip(pending, counted):
+        line_counts[i] = lines
+        if limit is not None and lines is not None and lines > limit and code_files[i].endswith(('.rs', '.lcy')):
+            truncated.add(rel_paths[i])
     
-    for file_path in code_files:
-        lines = count_lines(file_path)
-        rel_path = file_path.relative_to(root_dir)
+    for rel_path, signature, lines in zip(rel_paths, signatures, line_counts):
+        if lines is None:
+            # 读取失败按 0 行报告，但不写入缓存，文件恢复可读后会重新统计
+            lines = 0
+        elif signature is not None and rel_path not in truncated:
+            entries[rel_path] = signature + [lines]
+        results.append((rel_path, lines))
         
         if lines > MAX_LINES_ERROR:
             errors.append((rel_path, lines))
         elif  lines > MAX_LINES_WARNING:
             warnings.append((rel_path, lines))
     
-    return warnings, errors
+    if use_cache:
+        save_cache(cache_path, cache_header(), entries)
+    return warnings, errors, results, truncated
 
-def main():
-    """主函数"""
-    parser = argparse.ArgumentParser(description="检查代码文件大小")
-    parser.add_argument(
-        "--scope",
-        choices=["all", "rust", "lency"],
-        default="all",
-        help="检查范围: all/rust/lency (默认 all)",
-    )
-    args = parser.parse_args()
-
-    # 获取项目根目录
-    script_dir = Path(__file__).parent
-    project_root = script_dir.parent if script_dir.name == 'scripts' else script_dir
-    print(f"🔍 扫描代码文件 (Rust, Python)： {project_root} (scope={args.scope})")
+def run(
+    project_root: Path,
+    scope: str = "all",
+    use_cache: bool = True,
+    files: Optional[Iterable[SourceFile]] = None,
+    quick: bool = False,
+) -> int:
+    """执行检查并输出报告，返回退出码"""
+    print(f"🔍 扫描代码文件 (Rust, Python)： {project_root} (scope={scope})")
     print(f"   警告阈值: {MAX_LINES_WARNING} 行")
     print(f"   错误阈值: {MAX_LINES_ERROR} 行")
     print()
     
-    warnings, errors = check_file_sizes(project_root, args.scope)
+    warnings, errors, results, truncated = check_file_sizes(project_root, scope, use_cache, files, quick)
     
     # 输出结果
     has_issues = False
@@ -194,7 +326,7 @@ def main():
         has_issues = True
         print("❌ 错误：以下文件过大 (需要重构):")
         for file_path, lines in sorted(errors, key=lambda x: x[1], reverse=True):
-            print(f"   {file_path}: {lines} 行")
+            print(f"   {file_path}: {f'>{MAX_LINES_ERROR}' if file_path in truncated else lines} 行")
         print()
     
     if warnings:
@@ -208,19 +340,47 @@ def main():
         print("✅ 所有代码文件大小适中！")
     
     # 统计信息
-    all_files = find_code_files(project_root, args.scope)
-    total_lines = sum(count_lines(f) for f in all_files)
-    avg_lines = total_lines // len(all_files) if all_files else 0
+    total_lines = sum(lines for _, lines in results)
+    avg_lines = total_lines // len(results) if results else 0
     
     print(f"📊 统计:")
-    print(f"   总文件数: {len(all_files)}")
+    print(f"   总文件数: {len(results)}")
     print(f"   总行数: {total_lines}")
     print(f"   平均行数: {avg_lines}")
     print(f"   警告文件: {len(warnings)}")
     print(f"   错误文件: {len(errors)}")
+    if truncated:
+        print(f"   (--quick: 标为 >{MAX_LINES_ERROR} 的文件超过错误阈值后即停止计数，总行数为下限)")
+    
+    return 1 if errors else 0
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="检查代码文件大小")
+    parser.add_argument(
+        "--scope",
+        choices=["all", "rust", "lency"],
+        default="all",
+        help="检查范围: all/rust/lency (默认 all)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"不读取也不更新行数缓存 ({CACHE_FILE.parent.as_posix()}/check_file_size-<scope>.json)",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help=f"只判断是否超限：Rust/Lency 文件超过 {MAX_LINES_ERROR} 行即停止计数",
+    )
+    args = parser.parse_args()
+
+    # 获取项目根目录
+    script_dir = Path(__file__).parent
+    project_root = script_dir.parent if script_dir.name == 'scripts' else script_dir
     
     # 返回退出码
-    sys.exit(1 if errors else 0)
+    sys.exit(run(project_root, args.scope, use_cache=not args.no_cache, quick=args.quick))
 
 if __name__ == '__main__':
     main()
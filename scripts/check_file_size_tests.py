@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Unit tests for the check_file_size line counters."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# check_file_size.py imports its siblings as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import _common  # noqa: E402
+import check_file_size  # noqa: E402
+from check_file_size import count_nonblank_lines, count_rust_code_lines  # noqa: E402
+
+
+def count(source: str, limit: int | None = None) -> int:
+    return count_rust_code_lines(source.encode(), limit)
+
+
+class RustCommentTests(unittest.TestCase):
+    def test_skips_blank_lines_and_line_comments(self) -> None:
+        source = """// header
+
+fn main() {
+    let x = 1; // trailing comment
+    // whole-line comment
+}
+"""
+        self.assertEqual(count(source), 3)
+
+    def test_nested_block_comments(self) -> None:
+        source = """/* outer
+/* inner */
+still comment */
+fn f() {}
+let y = 2; /* a /* b */ c */ let z = 3;
+"""
+        self.assertEqual(count(source), 2)
+
+    def test_stray_block_comment_end_is_code(self) -> None:
+        self.assertEqual(count("let a = b */ c;\n"), 1)
+        # `*/*` is a stray `*/` followed by `*`, not a comment opener
+        self.assertEqual(count("x */* y\nz\n"), 2)
+
+    def test_unterminated_block_comment(self) -> None:
+        self.assertEqual(count("code();\n/* never closed\nmore\n"), 1)
+
+
+class RustLiteralTests(unittest.TestCase):
+    def test_comment_markers_inside_strings(self) -> None:
+        source = """let url = "http://example.com";
+let glob = "src/*.rs";
+// comment
+"""
+        self.assertEqual(count(source), 2)
+
+    def test_comment_markers_inside_char_literals(self) -> None:
+        source = """let slash = '/';
+let quote = '"';
+let escaped = '\\'';
+// comment
+"""
+        self.assertEqual(count(source), 3)
+
+    def test_lifetimes_are_not_char_literals(self) -> None:
+        source = """fn f<'a, 'b>(x: &'a str, y: &'b str) -> &'a str {
+    x // comment with 'quote
+}
+"""
+        self.assertEqual(count(source), 3)
+
+    def test_multi_line_string_counts_inner_lines(self) -> None:
+        source = """let s = "first
+// not a comment
+
+last";
+"""
+        self.assertEqual(count(source), 3)
+
+    def test_line_continuation_keeps_string_state(self) -> None:
+        source = 'let s = "hello \\\n    world";\n// comment\nlet t = "x";\n'
+        self.assertEqual(count(source), 3)
+        source = 'let s = "a \\\n b";\n/* x\n y */\nlet t = 1;\nlet u = 2;\n'
+        self.assertEqual(count(source), 4)
+
+    def test_raw_strings(self) -> None:
+        self.assertEqual(count('let p = r"C:\\";\n// comment\nlet q = 1;\n'), 2)
+        self.assertEqual(count('let p = r#"a "quoted" // x"#;\n// comment\n'), 1)
+        self.assertEqual(count('let p = br"\\";\n/*\n*/\nx\n'), 2)
+
+    def test_unterminated_string_is_code(self) -> None:
+        self.assertEqual(count('let s = "open\n// comment\n'), 1)
+
+
+class LimitTests(unittest.TestCase):
+    def test_limit_caps_count(self) -> None:
+        commented = "let x = 1; // c\n" * 1200
+        plain = "let x = 1;\n" * 1200
+        self.assertEqual(count(commented, 500), 501)
+        self.assertEqual(count(plain, 500), 501)
+
+    def test_limit_keeps_exact_count_below_limit(self) -> None:
+        source = "let x = 1; // c\n" * 10
+        self.assertEqual(count(source, 500), 10)
+        self.assertEqual(count(source), 10)
+
+
+class NonblankTests(unittest.TestCase):
+    def test_counts_non_blank_lines(self) -> None:
+        self.assertEqual(count_nonblank_lines(b"a\n\n  \n\tb\r\nc"), 3)
+        self.assertEqual(count_nonblank_lines(b""), 0)
+
+
+class CheckFileSizesTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        (self.root / "crates").mkdir()
+        _common.walk_source_files.cache_clear()
+
+    def check(self, **kwargs) -> tuple:
+        _common.walk_source_files.cache_clear()
+        with contextlib.redirect_stderr(io.StringIO()):
+            return check_file_size.check_file_sizes(self.root, "rust", **kwargs)
+
+    def test_failed_read_is_not_cached(self) -> None:
+        (self.root / "crates" / "big.rs").write_text("let x = 1;\n" * 600)
+        real_open_buffer = check_file_size.open_buffer
+
+        def unreadable(*args, **kwargs):
+            raise PermissionError("denied")
+
+        check_file_size.open_buffer = unreadable
+        try:
+            _, errors, _, _ = self.check()
+        finally:
+            check_file_size.open_buffer = real_open_buffer
+        self.assertEqual(errors, [])
+        _, errors, _, _ = self.check()
+        self.assertEqual(errors, [("crates/big.rs", 600)])
+
+    def test_quick_reports_lower_bound_and_keeps_exact_cache(self) -> None:
+        (self.root / "crates" / "cached.rs").write_text("let x = 1;\n" * 700)
+        self.check()
+        (self.root / "crates" / "new.rs").write_text("let x = 1;\n" * 800)
+        _, errors, _, truncated = self.check(quick=True)
+        self.assertEqual(truncated, {"crates/new.rs"})
+        self.assertIn(("crates/cached.rs", 700), errors)
+        cache_path = _common.scope_cache_path(self.root, check_file_size.CACHE_FILE, "rust")
+        entries = _common.load_cache(cache_path, check_file_size.cache_header())
+        self.assertEqual(entries["crates/cached.rs"][2], 700)
+        self.assertNotIn("crates/new.rs", entries)
+        _, errors, _, truncated = self.check()
+        self.assertEqual(truncated, set())
+        self.assertEqual(sorted(errors), [("crates/cached.rs", 700), ("crates/new.rs", 800)])
+
+
+if __name__ == "__main__":
+    unittest.main()
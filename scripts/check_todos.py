@@ -10,50 +10,158 @@ import os
 import sys
 import re
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Iterable, Optional
+
+from _common import (
+    Buffer, SourceFile, count_newlines, load_cache, open_buffer, save_cache, scope_cache_path, select_files,
+    walk_source_files,
+)
 
 # 配置
 EXCLUDE_DIRS = {'.git', 'target', 'node_modules', '.gemini', 'assets', 'docs', 'scripts', 'prompt'}
 EXTENSIONS = {'.rs', '.py', '.sh', '.md', '.lcy'}
 TAGS = {'TODO', 'FIXME', 'XXX'}
+SNIPPET_WIDTH = 60  # 报告中行内容的最大显示宽度
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # 扫描线程数
+CACHE_FILE = Path('target') / 'lency-checks' / 'check_todos.json'  # 相对项目根目录，按 scope 分文件
+CACHE_SCHEMA_VERSION = 3  # 扫描规则变化时递增，使旧缓存失效
+
+# 所有标记合并为一个正则，确保匹配单词边界；字节正则的边界只认 ASCII，
+# 紧邻非 ASCII 字符时再由 is_tag_boundary 按 Unicode 规则判断
+TAG_PATTERN = re.compile(rf"(?<![A-Za-z0-9_])({'|'.join(sorted(TAGS))})(?![A-Za-z0-9_])".encode())
+# 匹配 @expect-error 后面的内容
+EXPECT_ERROR_PATTERN = re.compile(rb'@expect-error:\s*(TODO|FIXME)\s*-\s*(.+)')
 
-def in_scope(rel_path: Path, scope: str) -> bool:
-    path = rel_path.as_posix()
+def in_scope(rel_path: str, scope: str) -> bool:
     if scope == "all":
         return True
     if scope == "rust":
         return (
-            path.startswith("crates/")
-            or path.startswith("lib/")
-            or path.startswith("tests/integration/")
+            rel_path.startswith("crates/")
+            or rel_path.startswith("lib/")
+            or rel_path.startswith("tests/integration/")
         )
     if scope == "lency":
         return (
-            path.startswith("lencyc/")
-            or path.startswith("lib/")
-            or path.startswith("tests/example/")
+            rel_path.startswith("lencyc/")
+            or rel_path.startswith("lib/")
+            or rel_path.startswith("tests/example/")
         )
     return False
 
-def find_files(root_dir: Path, scope: str = "all") -> List[Path]:
-    """查找所有源代码文件"""
-    found_files = []
-    for root, dirs, files in os.walk(root_dir):
-        # 过滤排除目录
-        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
-        
-        for file in files:
-            rel_root = Path(root).relative_to(root_dir)
-            rel_path = rel_root / file
-            if not in_scope(rel_path, scope):
-                continue
-            if any(file.endswith(ext) for ext in EXTENSIONS):
-                found_files.append(Path(root) / file)
+def find_files(
+    root_dir: Path,
+    scope: str = "all",
+    files: Optional[Iterable[SourceFile]] = None,
+    extensions: Iterable[str] = EXTENSIONS,
+    exclude: Iterable[str] = EXCLUDE_DIRS,
+) -> List[SourceFile]:
+    """查找所有源代码文件，返回 (文件路径, 相对路径, 签名)；files 为已有遍历结果时只做筛选"""
+    if files is None:
+        files = walk_source_files(str(root_dir), frozenset(extensions), frozenset(exclude))
+    else:
+        files = select_files(files, extensions, exclude)
+    return [source for source in files if in_scope(source[1], scope)]
+
+def is_word_char(char: str) -> bool:
+    """与 str 正则的 \\w 一致：Unicode 字母、数字或下划线"""
+    return char.isalnum() or char == '_'
+
+def is_tag_boundary(buf: Buffer, start: int, end: int) -> bool:
+    """标记 buf[start:end] 两侧的非 ASCII 字符若为字母或数字（如汉字），则不算单词边界
+
+    与按 UTF-8 解码后使用 Unicode \\b 的匹配结果保持一致，例如“这里TODO说明”不算标记。
+    """
+    if start > 0 and buf[start - 1] >= 0x80:
+        lead = start - 1
+        while lead > 0 and start - lead < 4 and 0x80 <= buf[lead] < 0xC0:
+            lead -= 1
+        if is_word_char(buf[lead:start].decode('utf-8', errors='replace')[-1:]):
+            return False
+    if end < len(buf) and buf[end] >= 0x80:
+        if is_word_char(buf[end:end + 4].decode('utf-8', errors='replace')[:1]):
+            return False
+    return True
+
+def scan_file(file_path: str, rel_path: str, size: Optional[int] = None) -> Optional[Tuple[List[Tuple], Optional[Tuple]]]:
+    """
+    扫描单个文件，返回两个结果（文件无法读取时返回 None）：
+    1. 普通 TODO/FIXME: [(tag, line_num, content)]
+    2. 预期失败测试中的 TODO/FIXME: (file, tag, reason) 或 None
+    """
+    try:
+        with open_buffer(file_path, size) as buf:
+            return scan_buffer(buf, rel_path)
+    except OSError:
+        return None
+
+def scan_buffer(buf: Buffer, rel_path: str) -> Tuple[List[Tuple], Optional[Tuple]]:
+    """扫描文件内容（bytes 或大文件的 mmap），返回值同 scan_file"""
+    hits = []
+    expected_failure = None
     
-    return found_files
+    # 检查文件开头是否有 @expect-error: TODO/FIXME（只检查前5行，逐行匹配，每个文件只记录一次）
+    line_start = 0
+    for _ in range(5):
+        line_end = buf.find(b'\n', line_start)
+        if line_end < 0:
+            line_end = len(buf)
+        # 限定在本行内搜索，原因不会取自下一行
+        match = EXPECT_ERROR_PATTERN.search(buf, line_start, line_end)
+        if match:
+            tag = match.group(1).decode()
+            reason = match.group(2).decode('utf-8', errors='replace').strip()
+            expected_failure = (rel_path, tag, reason)
+            break
+        if line_end >= len(buf):
+            break
+        line_start = line_end + 1
+    
+    # 检查普通 TODO/FIXME：整个文件一次正则扫描，只在命中处计算行号与行内容
+    line_no = 1
+    scanned = 0
+    line_end = -1
+    for match in TAG_PATTERN.finditer(buf):
+        start = match.start()
+        if not is_tag_boundary(buf, start, match.end()):
+            continue
+        if start > line_end:
+            line_no += count_newlines(buf, scanned, start)
+            scanned = start
+            line_start = buf.rfind(b'\n', 0, start) + 1
+            line_end = buf.find(b'\n', start)
+            if line_end < 0:
+                line_end = len(buf)
+            line = buf[line_start:line_end]
+            # 跳过 @expect-error 行，它们会单独处理
+            skip_line = b'@expect-error' in line
+            content = line.decode('utf-8', errors='replace').strip()
+            line_tags = set()
+        tag = match.group(1).decode()
+        if skip_line or tag in line_tags:
+            continue
+        line_tags.add(tag)
+        hits.append((tag, line_no, content))
+    
+    return hits, expected_failure
 
-def check_todos(root_dir: Path, scope: str = "all") -> Tuple[Dict[str, List], List[Tuple]]:
+def cache_header() -> Dict:
+    """缓存头：扫描规则版本或标记集合变化时，旧缓存整体失效
+
+    条目格式: {相对路径: [st_mtime_ns, st_size, hits, expected_failure]}
+    """
+    return {"schema": CACHE_SCHEMA_VERSION, "tags": sorted(TAGS)}
+
+def check_todos(
+    root_dir: Path,
+    scope: str = "all",
+    use_cache: bool = True,
+    files: Optional[Iterable[SourceFile]] = None,
+    extensions: Iterable[str] = EXTENSIONS,
+    exclude: Iterable[str] = EXCLUDE_DIRS,
+) -> Tuple[Dict[str, List], List[Tuple]]:
     """
     检查 TODOs，返回两个结果：
     1. 普通 TODO/FIXME: {tag: [(file, line_num, content)]}
@@ -62,66 +170,80 @@ def check_todos(root_dir: Path, scope: str = "all") -> Tuple[Dict[str, List], Li
     results = {tag: [] for tag in TAGS}
     expected_failures = []  # (file, tag, reason)
     
-    # 构建正则匹配模式，确保匹配单词边界
-    patterns = {tag: re.compile(rf'\b{tag}\b') for tag in TAGS}
-    # 匹配 @expect-error 后面的内容
-    expect_error_pattern = re.compile(r'@expect-error:\s*(TODO|FIXME)\s*-\s*(.+)')
+    found = find_files(root_dir, scope, files, extensions, exclude)
+    files = [file_path for file_path, _, _ in found]
+    rel_paths = [rel_path for _, rel_path, _ in found]
+    signatures = [signature for _, _, signature in found]
+    
+    # 签名 (mtime, size) 未变的文件直接复用缓存结果，只重新扫描其余文件
+    cache_path = scope_cache_path(root_dir, CACHE_FILE, scope)
+    cache = load_cache(cache_path, cache_header()) if use_cache else {}
+    entries = {}
+    scanned = [None] * len(files)
+    pending = []
+    for i, rel_path in enumerate(rel_paths):
+        cached = cache.get(rel_path)
+        if signatures[i] is not None and cached and cached[:2] == signatures[i]:
+            expected_failure = (rel_path, *cached[3]) if cached[3] else None
+            scanned[i] = (cached[2], expected_failure)
+        else:
+            pending.append(i)
     
-    files = find_files(root_dir, scope)
+    # 读文件期间会释放 GIL，用线程池并发扫描；map 保持文件顺序
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pending_results = executor.map(
+            lambda i: scan_file(files[i], rel_paths[i], signatures[i][1] if signatures[i] else None),
+            pending,
+        )
+        for i, result in zip(pending, pending_results):
+            scanned[i] = result
     
-    for file_path in files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                
-                # 检查文件开头是否有 @expect-error: TODO/FIXME
-                for i, line in enumerate(lines[:5]):  # 只检查前5行
-                    match = expect_error_pattern.search(line)
-                    if match:
-                        tag = match.group(1)
-                        reason = match.group(2).strip()
-                        rel_path = file_path.relative_to(root_dir)
-                        expected_failures.append((rel_path, tag, reason))
-                        break  # 每个文件只记录一次
-                
-                # 检查普通 TODO/FIXME（跳过 @expect-error 行）
-                for i, line in enumerate(lines, 1):
-                    if '@expect-error' in line:
-                        continue  # 跳过 @expect-error 行，它们会单独处理
-                    for tag, pattern in patterns.items():
-                        if pattern.search(line):
-                            rel_path = file_path.relative_to(root_dir)
-                            results[tag].append((rel_path, i, line.strip()))
-        except Exception:
-            # 忽略各种编码错误等
+    for rel_path, signature, result in zip(rel_paths, signatures, scanned):
+        if result is None:
+            # 忽略无法读取的文件，也不写入缓存，文件恢复可读后会重新扫描
             continue
-            
+        hits, expected_failure = result
+        for tag, line_no, content in hits:
+            results[tag].append((rel_path, line_no, content))
+        if expected_failure:
+            expected_failures.append(expected_failure)
+        if signature is not None:
+            entries[rel_path] = signature + [hits, list(expected_failure[1:]) if expected_failure else None]
+    
+    if use_cache:
+        save_cache(cache_path, cache_header(), entries)
     return results, expected_failures
 
-def main():
-    """主函数"""
-    parser = argparse.ArgumentParser(description="扫描 TODO/FIXME 标记")
-    parser.add_argument(
-        "--scope",
-        choices=["all", "rust", "lency"],
-        default="all",
-        help="检查范围: all/rust/lency (默认 all)",
-    )
-    args = parser.parse_args()
-
-    # 获取项目根目录
-    script_dir = Path(__file__).parent
-    project_root = script_dir.parent if script_dir.name == 'scripts' else script_dir
-    print(f"🔍 扫描 TODO/FIXME 标记： {project_root} (scope={args.scope})")
-    print()
+def run(
+    project_root: Path,
+    scope: str = "all",
+    use_cache: bool = True,
+    files: Optional[Iterable[SourceFile]] = None,
+    extensions: Iterable[str] = EXTENSIONS,
+    exclude: Iterable[str] = EXCLUDE_DIRS,
+    expect_errors: bool = True,
+    tags: Iterable[str] = tuple(sorted(TAGS)),
+    snippet_width: int = SNIPPET_WIDTH,
+    title: str = "TODO/FIXME 标记",
+    compact: bool = False,
+) -> int:
+    """执行扫描并输出报告，返回退出码；tags 为要报告的标记（TAGS 的子集，按给定顺序输出），
+    compact 为紧凑格式（标题不带 scope、分组间无空行、无标记时也输出总计）"""
+    if compact:
+        print(f"🔍 扫描 {title}：{project_root}")
+    else:
+        print(f"🔍 扫描 {title}： {project_root} (scope={scope})")
+        print()
     
-    results, expected_failures = check_todos(project_root, args.scope)
+    results, expected_failures = check_todos(project_root, scope, use_cache, files, extensions, exclude)
+    if not expect_errors:
+        expected_failures = []
     
     has_items = False
     total_count = 0
     
     # 先显示普通 TODO/FIXME
-    for tag in TAGS:
+    for tag in tags:
         items = results[tag]
         if items:
             has_items = True
@@ -133,10 +255,11 @@ def main():
             
             for file_path, line_num, content in items:
                 # 截断过长内容
-                if len(content) > 60:
-                    content = content[:57] + "..."
+                if len(content) > snippet_width:
+                    content = content[:snippet_width - 3] + "..."
                 print(f"   {file_path}:{line_num:<4} {content}")
-            print()
+            if not compact:
+                print()
     
     # 显示预期失败测试中的 TODO/FIXME
     if expected_failures:
@@ -158,14 +281,99 @@ def main():
             print()
             total_count += len(fixmes)
             
-    if not has_items:
+    if not has_items and not compact:
         print("✅ 没有发现未完成的标记！")
     else:
         print(f"📊 总计发现 {total_count} 个标记。")
         
     # 此脚本通常不应仅因为发现 TODO 就报错退出，除非是在严格的 CI 模式下
     # 这里我们只做报告，返回 0
-    sys.exit(0)
+    return 0
+
+def split_list(value: str) -> List[str]:
+    """解析逗号分隔的命令行列表参数"""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def main(argv: Optional[List[str]] = None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="扫描 TODO/FIXME 标记")
+    parser.add_argument(
+        "--scope",
+        choices=["all", "rust", "lency"],
+        default="all",
+        help="检查范围: all/rust/lency (默认 all)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"不读取也不更新扫描缓存 ({CACHE_FILE.parent.as_posix()}/check_todos-<scope>.json)",
+    )
+    parser.add_argument(
+        "--root",
+        type=Path,
+        help="扫描根目录 (默认项目根目录)",
+    )
+    parser.add_argument(
+        "--extensions",
+        type=split_list,
+        default=sorted(EXTENSIONS),
+        help=f"逗号分隔的文件扩展名 (默认 {','.join(sorted(EXTENSIONS))})",
+    )
+    parser.add_argument(
+        "--exclude-dirs",
+        type=split_list,
+        default=sorted(EXCLUDE_DIRS),
+        help=f"逗号分隔的排除目录名 (默认 {','.join(sorted(EXCLUDE_DIRS))})",
+    )
+    parser.add_argument(
+        "--expect-errors",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="是否报告 @expect-error 预期失败测试中的 TODO/FIXME (默认开启)",
+    )
+    parser.add_argument(
+        "--tags",
+        type=split_list,
+        default=sorted(TAGS),
+        help=f"逗号分隔的报告标记，按给定顺序输出 (默认 {','.join(sorted(TAGS))})",
+    )
+    parser.add_argument(
+        "--snippet-width",
+        type=int,
+        default=SNIPPET_WIDTH,
+        help=f"行内容的最大显示宽度，超出部分截断 (默认 {SNIPPET_WIDTH})",
+    )
+    parser.add_argument(
+        "--title",
+        default="TODO/FIXME 标记",
+        help="报告标题 (默认 \"TODO/FIXME 标记\")",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="紧凑报告格式：标题不带 scope、分组间无空行、无标记时也输出总计",
+    )
+    args = parser.parse_args(argv)
+    unknown_tags = set(args.tags) - TAGS
+    if unknown_tags:
+        parser.error(f"未知标记: {','.join(sorted(unknown_tags))} (可选 {','.join(sorted(TAGS))})")
+
+    # 获取项目根目录
+    script_dir = Path(__file__).parent
+    project_root = script_dir.parent if script_dir.name == 'scripts' else script_dir
+    
+    sys.exit(run(
+        args.root or project_root,
+        args.scope,
+        use_cache=not args.no_cache,
+        extensions=args.extensions,
+        exclude=args.exclude_dirs,
+        expect_errors=args.expect_errors,
+        tags=args.tags,
+        snippet_width=args.snippet_width,
+        title=args.title,
+        compact=args.compact,
+    ))
 
 if __name__ == '__main__':
     main()
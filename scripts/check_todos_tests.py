@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Unit tests for the check_todos scanner."""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# check_todos.py imports its siblings as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import _common  # noqa: E402
+import check_todos  # noqa: E402
+from check_todos import scan_buffer  # noqa: E402
+
+
+def hits(source: str) -> list:
+    return scan_buffer(source.encode(), "x.rs")[0]
+
+
+def tags(source: str) -> list:
+    return [tag for tag, _, _ in hits(source)]
+
+
+class TagBoundaryTests(unittest.TestCase):
+    def test_tag_glued_to_cjk_text_does_not_match(self) -> None:
+        self.assertEqual(tags("// 这里TODO说明\n"), [])
+
+    def test_tag_separated_from_cjk_text_matches(self) -> None:
+        self.assertEqual(tags("// 这里 TODO 说明\n"), ["TODO"])
+        self.assertEqual(tags("// TODO: fix\n"), ["TODO"])
+        # 全角标点不是单词字符
+        self.assertEqual(tags("// 说明，FIXME：修复\n"), ["FIXME"])
+
+    def test_longer_words_do_not_match(self) -> None:
+        self.assertEqual(tags("// XXXX TODOS FIXMEs _TODO TODO1\n"), [])
+
+
+class HitTests(unittest.TestCase):
+    def test_one_hit_per_tag_per_line(self) -> None:
+        self.assertEqual(
+            hits("// TODO FIXME TODO\n"),
+            [("TODO", 1, "// TODO FIXME TODO"), ("FIXME", 1, "// TODO FIXME TODO")],
+        )
+
+    def test_line_numbers_after_skipped_matches(self) -> None:
+        source = "// 这里TODO说明\nfn f() {}\n\n// TODO: real\nlet x = 1; // FIXME\n"
+        self.assertEqual(
+            hits(source),
+            [("TODO", 4, "// TODO: real"), ("FIXME", 5, "let x = 1; // FIXME")],
+        )
+
+    def test_last_line_without_newline(self) -> None:
+        self.assertEqual(hits("fn f() {}\n// XXX end"), [("XXX", 2, "// XXX end")])
+
+
+class ExpectErrorTests(unittest.TestCase):
+    def test_expect_error_lines_are_not_normal_hits(self) -> None:
+        source = "// @expect-error: TODO - generics\n// TODO: other\n"
+        found, expected = scan_buffer(source.encode(), "x.lcy")
+        self.assertEqual(found, [("TODO", 2, "// TODO: other")])
+        self.assertEqual(expected, ("x.lcy", "TODO", "generics"))
+
+    def test_reason_is_not_taken_from_next_line(self) -> None:
+        source = b"// @expect-error: TODO -\n// real reason\nfn main(){}\n"
+        self.assertIsNone(scan_buffer(source, "x.lcy")[1])
+
+    def test_only_first_five_lines_are_checked(self) -> None:
+        source = b"1\n2\n3\n4\n5\n// @expect-error: FIXME - late\n"
+        self.assertIsNone(scan_buffer(source, "x.lcy")[1])
+
+
+class CheckTodosTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        (self.root / "src").mkdir()
+        (self.root / "src" / "a.rs").write_text("// TODO: a\nfn a() {}\n// FIXME b\n", encoding="utf-8")
+        (self.root / "src" / "b.lcy").write_text(
+            "// @expect-error: FIXME - codegen\n// 这里TODO说明\n// XXX c\n", encoding="utf-8"
+        )
+
+    def check(self, use_cache: bool) -> tuple:
+        _common.walk_source_files.cache_clear()
+        return check_todos.check_todos(self.root, "all", use_cache)
+
+    def test_cache_round_trip_matches_uncached_run(self) -> None:
+        expected = self.check(use_cache=False)
+        self.assertEqual(self.check(use_cache=True), expected)
+
+        # 第二次运行只能从缓存取得结果
+        real_open_buffer = check_todos.open_buffer
+
+        def unreadable(*args, **kwargs):
+            raise PermissionError("denied")
+
+        check_todos.open_buffer = unreadable
+        try:
+            self.assertEqual(self.check(use_cache=True), expected)
+        finally:
+            check_todos.open_buffer = real_open_buffer
+
+    def test_mmap_buffers_match_bytes(self) -> None:
+        expected = self.check(use_cache=False)
+        real_min_size = _common.MMAP_MIN_SIZE
+        _common.MMAP_MIN_SIZE = 1
+        try:
+            self.assertEqual(self.check(use_cache=False), expected)
+        finally:
+            _common.MMAP_MIN_SIZE = real_min_size
+
+
+if __name__ == "__main__":
+    unittest.main()
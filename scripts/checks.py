@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+一次遍历运行文件大小检查与 TODO/FIXME 扫描
+
+目录树只遍历一遍，结果按各自的扩展名与排除目录分发给
+check_file_size.py 和 check_todos.py，输出与分别运行两个脚本一致。
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import check_file_size
+import check_todos
+from _common import walk_source_files
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="一次遍历运行文件大小与 TODO/FIXME 检查")
+    parser.add_argument(
+        "--scope",
+        choices=["all", "rust", "lency"],
+        default="all",
+        help="检查范围: all/rust/lency (默认 all)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="不读取也不更新两项检查的结果缓存",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="文件大小检查只判断是否超限，超过错误阈值即停止计数",
+    )
+    args = parser.parse_args()
+
+    # 获取项目根目录
+    script_dir = Path(__file__).parent
+    project_root = script_dir.parent if script_dir.name == 'scripts' else script_dir
+
+    # 按两项检查的并集遍历一次，各检查再筛出自己关心的文件
+    files = walk_source_files(
+        str(project_root),
+        frozenset(check_file_size.EXTENSIONS | check_todos.EXTENSIONS),
+        frozenset(check_file_size.EXCLUDE_DIRS & check_todos.EXCLUDE_DIRS),
+    )
+    use_cache = not args.no_cache
+
+    size_status = check_file_size.run(project_root, args.scope, use_cache, files, args.quick)
+    print()
+    # TODO 扫描只做报告，不影响退出码
+    check_todos.run(project_root, args.scope, use_cache, files)
+
+    sys.exit(size_status)
+
+if __name__ == '__main__':
+    main()
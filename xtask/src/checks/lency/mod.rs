@@ -52,7 +52,13 @@ pub(crate) fn check_lency() -> Result<()> {
         || {
             run_python(
                 &python,
-                &["-m", "unittest", "scripts.check_lencyc_meta_tests"],
+                &[
+                    "-m",
+                    "unittest",
+                    "scripts.check_lencyc_meta_tests",
+                    "scripts.check_file_size_tests",
+                    "scripts.check_todos_tests",
+                ],
                 false,
             )?;
             run_python(